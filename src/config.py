@@ -21,4 +21,19 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-META_TAG_NAME="png-meta-data"
\ No newline at end of file
+import os
+from pathlib import Path
+from typing import Iterator
+
+
+META_TAG_NAME="png-meta-data"
+
+
+def iter_pngs(directory: Path) -> Iterator[Path]:
+    """Yield the PNG files in a directory"""
+    # scandir provides names and file types without a stat call per entry,
+    # and paths are only built for matching files
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.png') and entry.is_file():
+                yield Path(entry.path)
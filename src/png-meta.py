@@ -22,21 +22,34 @@
 
 
 import argparse
+import asyncio
 import os
 import sys
 import time
-import json
 import base64
+import io
+import math
+import mmap
+import random
+import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
+import zlib
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional, Set, Literal
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple, Literal
+import orjson
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from openai import OpenAI
+from openai import AsyncOpenAI, APIError, APIStatusError, RateLimitError, APIConnectionError, InternalServerError
 from PIL import Image
 from PIL.PngImagePlugin import PngInfo
 from pydantic import BaseModel
-from config import META_TAG_NAME
+from config import META_TAG_NAME, iter_pngs
 
 # Load environment variables from .env file
 try:
@@ -59,6 +72,31 @@ class ScreenshotAnalysisModel(BaseModel):
     type: Literal["screenshot", "photograph", "graphic"]
 
 
+class ScreenshotAnalysisBatchModel(BaseModel):
+    """Pydantic model for OpenAI structured output covering several images"""
+    items: List[ScreenshotAnalysisModel]
+
+
+def build_response_format(model: type, name: str) -> dict:
+    """Build a strict json_schema response_format from a Pydantic model"""
+    schema = model.model_json_schema()
+    
+    # Strict mode requires every object to reject additional properties
+    for definition in [schema, *schema.get('$defs', {}).values()]:
+        if definition.get('type') == 'object':
+            definition['additionalProperties'] = False
+    
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": schema, "strict": True}
+    }
+
+
+# JSON schemas are built once rather than on every request
+ANALYSIS_RESPONSE_FORMAT = build_response_format(ScreenshotAnalysisModel, "ScreenshotAnalysis")
+BATCH_ANALYSIS_RESPONSE_FORMAT = build_response_format(ScreenshotAnalysisBatchModel, "ScreenshotAnalysisBatch")
+
+
 @dataclass
 class ScreenshotAnalysis:
     """Data class for screenshot analysis results"""
@@ -119,43 +157,144 @@ class ScreenshotAnalysis:
     
     def to_json(self) -> str:
         """Convert to JSON string"""
-        return json.dumps(self.to_dict(), indent=2)
+        return orjson.dumps(self.to_dict(), option=orjson.OPT_INDENT_2).decode('utf-8')
     
     def to_metadata_json(self) -> str:
         """Convert to JSON string for metadata storage (excludes filename and file_path)"""
-        return json.dumps(self.to_metadata_dict(), indent=2)
+        return orjson.dumps(self.to_metadata_dict(), option=orjson.OPT_INDENT_2).decode('utf-8')
 
 
-# Global state
-known_files: Set[str] = set()
-openai_client: Optional[OpenAI] = None
-verbose_mode: bool = False
-analyze_mode: bool = False
+class RateLimiter:
+    """Token bucket that meters requests and tokens per minute before dispatch"""
+    
+    def __init__(self, max_requests_per_minute: float, max_tokens_per_minute: float):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_request_capacity = max_requests_per_minute
+        self.available_token_capacity = max_tokens_per_minute
+        self.last_update_time = time.monotonic()
+    
+    def replenish(self):
+        """Refill both buckets based on the time elapsed since the last update"""
+        now = time.monotonic()
+        elapsed = now - self.last_update_time
+        self.available_request_capacity = min(
+            self.available_request_capacity + elapsed * self.max_requests_per_minute / 60.0,
+            self.max_requests_per_minute
+        )
+        self.available_token_capacity = min(
+            self.available_token_capacity + elapsed * self.max_tokens_per_minute / 60.0,
+            self.max_tokens_per_minute
+        )
+        self.last_update_time = now
+    
+    async def acquire(self, token_cost: int):
+        """Wait until both buckets can afford the request, then consume capacity"""
+        # A request larger than the whole bucket would otherwise wait forever
+        token_cost = min(token_cost, self.max_tokens_per_minute)
+        
+        while True:
+            self.replenish()
+            if self.available_request_capacity >= 1 and self.available_token_capacity >= token_cost:
+                self.available_request_capacity -= 1
+                self.available_token_capacity -= token_cost
+                return
+            
+            # Sleep until the scarcer bucket has refilled enough
+            request_wait = (1 - self.available_request_capacity) * 60.0 / self.max_requests_per_minute
+            token_wait = (token_cost - self.available_token_capacity) * 60.0 / self.max_tokens_per_minute
+            await asyncio.sleep(max(request_wait, token_wait, 0.001))
 
 
-def setup_openai_client(api_key: Optional[str] = None) -> OpenAI:
-    """Initialize OpenAI client"""
-    global openai_client
-    openai_client = OpenAI(api_key=api_key or os.getenv('OPENAI_API_KEY'))
-    return openai_client
+class AnalysisIndex:
+    """SQLite index of analyzed files, keyed by path and validated by mtime and size"""
+    
+    def __init__(self, index_path: Path):
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Shared between the event loop and worker threads, so access is locked
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(index_path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL, size INTEGER)")
+        
+        self.entries = {
+            path: (mtime, size)
+            for path, mtime, size in self.connection.execute("SELECT path, mtime, size FROM files")
+        }
+    
+    def is_analyzed(self, image_path: Path) -> bool:
+        """Check if the file is unchanged since it was recorded as analyzed"""
+        entry = self.entries.get(str(image_path))
+        if not entry:
+            return False
+        
+        try:
+            stat = image_path.stat()
+        except OSError:
+            return False
+        return entry == (stat.st_mtime, stat.st_size)
+    
+    def record(self, image_path: Path):
+        """Record the file as analyzed along with its current mtime and size"""
+        stat = image_path.stat()
+        entry = (stat.st_mtime, stat.st_size)
+        
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                (str(image_path), *entry)
+            )
+            self.entries[str(image_path)] = entry
 
 
-def encode_image(image_path: Path) -> str:
-    """Encode image to base64 string"""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+# PNG chunk layout
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+TEXT_CHUNK_TYPES = {b'tEXt', b'zTXt', b'iTXt'}
 
+# Number of threads used to check files for existing metadata
+METADATA_SCAN_WORKERS = 16
 
-def analyze_screenshot(image_path: Path) -> ScreenshotAnalysis:
-    """Analyze screenshot using OpenAI Vision API with structured output"""
-    global openai_client
-    
-    try:
-        # Encode the image
-        base64_image = encode_image(image_path)
-        
-        # Create the system prompt
-        system_prompt = """Analyze this image and provide detailed information:
+# OpenAI request settings
+MAX_TOKENS = 1500
+MAX_API_ATTEMPTS = 3
+
+# Errors worth retrying (APIConnectionError includes timeouts)
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# Watch mode waits this long after a file's last event before processing it
+DEBOUNCE_SECONDS = 0.2
+DEBOUNCE_POLL_SECONDS = 0.1
+
+# Polling used to check that a new file has finished being written
+FILE_STABLE_POLL_SECONDS = 0.02
+FILE_STABLE_MAX_POLLS = 20
+
+# Files at least this large are memory mapped rather than read when encoding
+MMAP_MIN_SIZE = 10 * 1024 * 1024
+
+# Larger images are downscaled and sent as JPEG
+MAX_UPLOAD_DIMENSION = 2048
+UPLOAD_JPEG_QUALITY = 85
+
+# Keeps the combined output of a multi-image request within the model's limit
+MAX_IMAGES_PER_REQUEST = 10
+
+# Sidecar index of files known to have analysis metadata
+INDEX_PATH = Path.home() / ".png-meta" / "index.sqlite"
+
+# Batch API settings
+BATCH_STATE_FILENAME = ".png-meta-batch.json"
+BATCH_POLL_SECONDS = 30
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Batch API input file limits, larger scans are split across several batches
+BATCH_MAX_FILE_BYTES = 200 * 1000 * 1000
+BATCH_MAX_REQUESTS = 50000
+
+# Instructions sent with every analysis request
+SYSTEM_PROMPT = """Analyze this image and provide detailed information:
 
 **title**: A concise, descriptive title for the image (3-8 words)
 **short_description**: A brief one-sentence description (under 100 characters)
@@ -170,40 +309,235 @@ def analyze_screenshot(image_path: Path) -> ScreenshotAnalysis:
   - "graphic": Digital art, illustrations, logos, designs, charts, diagrams
 
 Be thorough in text extraction and accurate in classification."""
+
+# Built once and shared by every request
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+SYSTEM_PROMPT_TOKENS = len(SYSTEM_PROMPT) // 4
+
+
+# Global state
+known_files: Set[str] = set()
+openai_client: Optional[AsyncOpenAI] = None
+openai_api_key: Optional[str] = None
+rate_limiter: Optional[RateLimiter] = None
+png_compress_level: int = 1
+analysis_index: Optional[AnalysisIndex] = None
+verbose_mode: bool = False
+analyze_mode: bool = False
+
+
+def setup_openai_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """Initialize OpenAI client for the current event loop"""
+    global openai_client
+    # Retries are handled by request_completion so they go through the rate limiter
+    openai_client = AsyncOpenAI(
+        api_key=api_key or openai_api_key or os.getenv('OPENAI_API_KEY'),
+        max_retries=0
+    )
+    return openai_client
+
+
+def encode_image(image_file: BinaryIO) -> str:
+    """Encode an open image file to base64 string"""
+    size = os.fstat(image_file.fileno()).st_size
+    
+    if size >= MMAP_MIN_SIZE:
+        # Encode large files straight from the page cache without copying them
+        with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return base64.b64encode(mapped).decode('ascii')
+    
+    # Read straight into a preallocated buffer to avoid an intermediate copy
+    buffer = bytearray(size)
+    image_file.seek(0)
+    bytes_read = image_file.readinto(buffer)
+    
+    # base64 output is always ASCII
+    return base64.b64encode(memoryview(buffer)[:bytes_read]).decode('ascii')
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Estimate the input tokens used by a high detail image"""
+    # Images are scaled to fit within 2048x2048, then so the shortest side
+    # is at most 768px, and billed at 170 tokens per 512px tile plus 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+async def request_completion(token_cost: int, description: str, response_model: type, **kwargs) -> BaseModel:
+    """Make a structured output request, respecting rate limits and retrying transient errors"""
+    global openai_client, rate_limiter, verbose_mode
+    
+    for attempt in range(1, MAX_API_ATTEMPTS + 1):
+        if rate_limiter:
+            await rate_limiter.acquire(token_cost)
+        
+        try:
+            response = await openai_client.chat.completions.create(**kwargs)
+            
+            message = response.choices[0].message
+            if message.refusal:
+                raise ValueError(f"Request refused: {message.refusal}")
+            return response_model.model_validate_json(message.content)
+        except RETRYABLE_ERRORS as e:
+            if attempt == MAX_API_ATTEMPTS:
+                raise
+            
+            # Exponential backoff with jitter
+            delay = 2 ** attempt + random.uniform(0, 1)
+            if verbose_mode:
+                print(f"Retrying {description} in {delay:.1f}s ({e})")
+            await asyncio.sleep(delay)
+
+
+def build_image_content(image_path: Path) -> Tuple[dict, int]:
+    """Build the message content part for an image, along with its estimated input tokens"""
+    # Chat Completions only accepts images as URLs, and the API can't reach
+    # local files, so the image is sent inline rather than uploaded through
+    # the Files API (file ids are PDF-only here).
+    # The file is opened once and shared by the size check and the encode.
+    with open(image_path, "rb") as image_file, Image.open(image_file) as img:
+        image_tokens = estimate_image_tokens(*img.size)
+        
+        if max(img.size) <= MAX_UPLOAD_DIMENSION:
+            mime_type = "image/png"
+            base64_image = encode_image(image_file)
+        else:
+            # High detail analysis scales images to fit within 2048x2048 anyway,
+            # so larger images only cost upload bytes
+            img.thumbnail((MAX_UPLOAD_DIMENSION, MAX_UPLOAD_DIMENSION), Image.Resampling.LANCZOS)
+            
+            # Flatten any transparency onto white, as JPEG has no alpha channel
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = Image.new('RGBA', img.size, (255, 255, 255, 255))
+                img = Image.alpha_composite(background, img)
+            
+            with io.BytesIO() as buffer:
+                img.convert('RGB').save(buffer, "JPEG", quality=UPLOAD_JPEG_QUALITY)
+                base64_image = base64.b64encode(buffer.getvalue()).decode('ascii')
+            mime_type = "image/jpeg"
+    
+    image_content = {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:{mime_type};base64,{base64_image}",
+            "detail": "high"
+        }
+    }
+    return image_content, image_tokens
+
+
+def build_analysis_request(image_content: dict) -> dict:
+    """Build the chat completion parameters for analyzing a single image"""
+    return {
+        "model": "gpt-4o-2024-08-06",
+        "messages": [
+            SYSTEM_MESSAGE,
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "Please analyze this image:"},
+                    image_content
+                ]
+            }
+        ],
+        "max_tokens": MAX_TOKENS,
+        "temperature": 0.1
+    }
+
+
+async def analyze_screenshot(image_path: Path) -> ScreenshotAnalysis:
+    """Analyze screenshot using OpenAI Vision API with structured output"""
+    global openai_client
+    
+    try:
+        # Resizing and encoding are CPU bound, so keep them off the event loop
+        image_content, image_tokens = await asyncio.to_thread(build_image_content, image_path)
+        
+        # Estimate the tokens this request counts against the TPM limit
+        token_cost = MAX_TOKENS + SYSTEM_PROMPT_TOKENS + image_tokens
         
         # Make API call with structured output
-        response = openai_client.beta.chat.completions.parse(
+        analysis_model = await request_completion(
+            token_cost,
+            image_path.name,
+            ScreenshotAnalysisModel,
+            response_format=ANALYSIS_RESPONSE_FORMAT,
+            **build_analysis_request(image_content)
+        )
+        
+        # Convert to ScreenshotAnalysis dataclass
+        return ScreenshotAnalysis.from_pydantic_model(analysis_model, image_path)
+        
+    except Exception as e:
+        print(f"Error calling OpenAI API: {e}")
+        return create_error_analysis(image_path, f"API error: {e}")
+
+
+async def analyze_screenshots_batch(image_paths: List[Path]) -> List[ScreenshotAnalysis]:
+    """Analyze several screenshots in a single request, falling back to one request per image on an unusable response"""
+    if len(image_paths) == 1:
+        return [await analyze_screenshot(image_paths[0])]
+    
+    try:
+        # Resizing and encoding are CPU bound, so keep them off the event loop
+        images = await asyncio.gather(*[asyncio.to_thread(build_image_content, path) for path in image_paths])
+        
+        # Label each image so results can be matched back by position
+        content = [{
+            "type": "text",
+            "text": f"Please analyze each of these {len(image_paths)} images. "
+                    "Return one analysis per image in items, in the same order as the images:"
+        }]
+        token_cost = SYSTEM_PROMPT_TOKENS + MAX_TOKENS * len(image_paths)
+        
+        for i, (image_content, image_tokens) in enumerate(images):
+            content.append({"type": "text", "text": f"Image {i}:"})
+            content.append(image_content)
+            token_cost += image_tokens
+    except Exception as e:
+        # No request has been made yet, so isolate the image that can't be read
+        print(f"Could not prepare batch, analyzing images individually: {e}")
+        return list(await asyncio.gather(*[analyze_screenshot(path) for path in image_paths]))
+    
+    try:
+        batch_model = await request_completion(
+            token_cost,
+            f"batch of {len(image_paths)} images",
+            ScreenshotAnalysisBatchModel,
             model="gpt-4o-2024-08-06",
             messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Please analyze this image:"},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}",
-                                "detail": "high"
-                            }
-                        }
-                    ]
-                }
+                SYSTEM_MESSAGE,
+                {"role": "user", "content": content}
             ],
-            response_format=ScreenshotAnalysisModel,
-            max_tokens=1500,
+            response_format=BATCH_ANALYSIS_RESPONSE_FORMAT,
+            max_tokens=MAX_TOKENS * len(image_paths),
             temperature=0.1
         )
         
-        # Extract the parsed result
-        analysis_model = response.choices[0].message.parsed
+        items = batch_model.items
+        if len(items) != len(image_paths):
+            raise ValueError(f"expected {len(image_paths)} analyses, got {len(items)}")
         
-        # Convert to ScreenshotAnalysis dataclass
-        return ScreenshotAnalysis.from_pydantic_model(analysis_model, image_path)
+        return [ScreenshotAnalysis.from_pydantic_model(item, path) for item, path in zip(items, image_paths)]
         
+    except RETRYABLE_ERRORS as e:
+        # Retries are already exhausted, so more requests would only add load
+        print(f"Error calling OpenAI API: {e}")
+        return [create_error_analysis(path, f"API error: {e}") for path in image_paths]
+    except (ValueError, APIStatusError) as e:
+        # Refusals, schema validation failures, mismatched item counts (pydantic's
+        # ValidationError is a ValueError) and rejected requests such as an invalid
+        # image may only be down to one image, so retry each on its own
+        print(f"Batch analysis failed, analyzing images individually: {e}")
+        return list(await asyncio.gather(*[analyze_screenshot(path) for path in image_paths]))
     except Exception as e:
         print(f"Error calling OpenAI API: {e}")
-        return create_error_analysis(image_path, f"API error: {e}")
+        return [create_error_analysis(path, f"API error: {e}") for path in image_paths]
 
 
 def create_error_analysis(image_path: Path, error_msg: str) -> ScreenshotAnalysis:
@@ -222,62 +556,276 @@ def create_error_analysis(image_path: Path, error_msg: str) -> ScreenshotAnalysi
     )
 
 
+def build_text_chunk(key: str, value: str) -> bytes:
+    """Build a tEXt chunk, or an uncompressed iTXt chunk if value is not Latin-1"""
+    try:
+        chunk_type = b'tEXt'
+        data = key.encode('latin-1') + b'\x00' + value.encode('latin-1')
+    except UnicodeEncodeError:
+        # Compression flag, compression method, empty language tag and translated keyword
+        chunk_type = b'iTXt'
+        data = key.encode('latin-1') + b'\x00\x00\x00\x00\x00' + value.encode('utf-8')
+    
+    crc = zlib.crc32(chunk_type + data)
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+
+def splice_text_chunk(image_path: Path, key: str, value: str):
+    """Insert a text chunk after IHDR without re-encoding the image data"""
+    # Write next to the real file, so a symlink is followed rather than replaced
+    image_path = image_path.resolve()
+    
+    data = memoryview(image_path.read_bytes())
+    keyword = key.encode('latin-1') + b'\x00'
+    
+    if bytes(data[:len(PNG_SIGNATURE)]) != PNG_SIGNATURE or bytes(data[12:16]) != b'IHDR':
+        raise ValueError("Not a PNG file")
+    
+    ihdr_length, = struct.unpack_from('>I', data, len(PNG_SIGNATURE))
+    if ihdr_length != 13:
+        raise ValueError(f"Invalid IHDR length: {ihdr_length}")
+    
+    # Signature, then the IHDR length, type, data and CRC
+    ihdr_end = len(PNG_SIGNATURE) + 8 + ihdr_length + 4
+    parts = [data[:ihdr_end], build_text_chunk(key, value)]
+    
+    # Copy the remaining chunks, dropping any existing text chunk for this key
+    offset = ihdr_end
+    while offset < len(data):
+        if offset + 8 > len(data):
+            raise ValueError("Truncated PNG chunk")
+        
+        length, chunk_type = struct.unpack_from('>I4s', data, offset)
+        chunk_end = offset + 8 + length + 4
+        if chunk_end > len(data):
+            raise ValueError("Truncated PNG chunk")
+        
+        chunk_data = data[offset + 8:offset + 8 + length]
+        if not (chunk_type in TEXT_CHUNK_TYPES and bytes(chunk_data[:len(keyword)]) == keyword):
+            parts.append(data[offset:chunk_end])
+        
+        offset = chunk_end
+        if chunk_type == b'IEND':
+            break
+    
+    # Write to a temporary file then swap it in, so the original is never half written
+    temp_path = image_path.with_suffix('.png.tmp')
+    try:
+        with open(temp_path, "wb") as temp_file:
+            for part in parts:
+                temp_file.write(part)
+        shutil.copymode(image_path, temp_path)
+        os.replace(temp_path, image_path)
+    except Exception:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
 def store_analysis_in_png(image_path: Path, analysis: ScreenshotAnalysis) -> bool:
     """Store analysis results as metadata in the PNG file"""
+    # Store the analysis as JSON (excluding filename and file_path)
+    analysis_json = analysis.to_metadata_json()
+    
+    try:
+        # Add the metadata chunk directly, leaving the image data untouched
+        splice_text_chunk(image_path, META_TAG_NAME, analysis_json)
+        record_analyzed(image_path)
+        return True
+    except Exception as e:
+        if verbose_mode:
+            print(f"Could not add metadata chunk directly, re-saving image: {e}")
+    
     try:
         # Open the original image
         with Image.open(image_path) as img:
             # Create new metadata
             metadata = PngInfo()
-            
-            # Store the analysis as JSON (excluding filename and file_path)
-            analysis_json = analysis.to_metadata_json()
             metadata.add_text(META_TAG_NAME, analysis_json)
             
-            # Copy any existing metadata (except our analysis field)
-            if hasattr(img, 'text') and img.text:
-                for key, value in img.text.items():
-                    if key != META_TAG_NAME:
-                        metadata.add_text(key, value)
+            # Copy any existing metadata (except our analysis field). The
+            # image is loaded by save() anyway, so reading text (which also
+            # picks up chunks after the image data) costs no extra decode.
+            existing_text = getattr(img, 'text', None) or {}
+            for key, value in existing_text.items():
+                if key != META_TAG_NAME:
+                    metadata.add_text(key, value)
             
             # Save with metadata (overwrite original)
-            img.save(image_path, "PNG", pnginfo=metadata)
-            
-            return True
+            img.save(image_path, "PNG", pnginfo=metadata, compress_level=png_compress_level, optimize=False)
+        
+        record_analyzed(image_path)
+        return True
             
     except Exception as e:
         print(f"Error storing metadata in PNG: {e}")
         return False
 
 
+def record_analyzed(image_path: Path):
+    """Record in the index that the file has analysis metadata"""
+    if not analysis_index:
+        return
+    
+    try:
+        analysis_index.record(image_path)
+    except (OSError, sqlite3.Error) as e:
+        if verbose_mode:
+            print(f"Could not update index for {image_path.name}: {e}")
+
+
+def check_analysis_metadata(image_path: Path) -> bool:
+    """Check if PNG file has analysis metadata, skipping files the index knows are analyzed"""
+    if analysis_index and analysis_index.is_analyzed(image_path):
+        return True
+    
+    analyzed = has_analysis_metadata(image_path)
+    if analyzed:
+        record_analyzed(image_path)
+    return analyzed
+
+
 def has_analysis_metadata(image_path: Path) -> bool:
     """Check if PNG file already has analysis metadata"""
+    # Walk the chunk headers directly instead of decoding the image with PIL,
+    # seeking past image data and reading only the keyword of text chunks
+    keyword = META_TAG_NAME.encode('latin-1') + b'\x00'
+    
     try:
-        with Image.open(image_path) as img:
-            if hasattr(img, 'text') and img.text:
-                return META_TAG_NAME in img.text
-        return False
+        with open(image_path, "rb") as png_file:
+            if png_file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+                return False
+            
+            while True:
+                header = png_file.read(8)
+                if len(header) < 8:
+                    return False
+                
+                length, chunk_type = struct.unpack('>I4s', header)
+                if chunk_type == b'IEND':
+                    return False
+                
+                # Skip the chunk data and its 4 byte CRC
+                remaining = length + 4
+                if chunk_type in TEXT_CHUNK_TYPES and length >= len(keyword):
+                    if png_file.read(len(keyword)) == keyword:
+                        return True
+                    remaining -= len(keyword)
+                png_file.seek(remaining, os.SEEK_CUR)
     except Exception as e:
         if verbose_mode:
             print(f"Error checking metadata for {image_path.name}: {e}")
         return False
 
 
-def scan_and_analyze_directory(directory: Path):
-    """Scan directory for PNG files and analyze those without metadata"""
+async def analyze_directory_pipeline(png_files: List[Path], max_concurrent: int, images_per_request: int) -> dict:
+    """Check files for metadata and analyze those without it, overlapping both stages"""
     global verbose_mode
     
-    png_files = list(directory.glob("*.png"))
-    total_files = len(png_files)
+    client = setup_openai_client()
+    loop = asyncio.get_running_loop()
     
-    print(f"Scanning {total_files} PNG files in: {directory}")
+    # Holds batches of files waiting for analysis; bounded so checks don't run far ahead
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_concurrent * 2)
+    
+    # Only a window of checks is in flight at once, so when the queue is full
+    # no further checks are submitted until a consumer takes a batch
+    check_window = METADATA_SCAN_WORKERS * 2
+    
+    counts = {"with_metadata": 0, "to_analyze": 0, "analyzed": 0}
+    
+    async def produce():
+        batch = []
+        remaining = iter(png_files)
+        checks = deque()
+        
+        with ThreadPoolExecutor(max_workers=METADATA_SCAN_WORKERS) as executor:
+            def submit_checks():
+                for png_file in remaining:
+                    checks.append((png_file, loop.run_in_executor(executor, check_analysis_metadata, png_file)))
+                    if len(checks) >= check_window:
+                        return
+            
+            submit_checks()
+            while checks:
+                png_file, check = checks.popleft()
+                analyzed = await check
+                submit_checks()
+                
+                if analyzed:
+                    counts["with_metadata"] += 1
+                    if verbose_mode:
+                        print(f"{png_file.name} - already has analysis metadata")
+                    continue
+                
+                counts["to_analyze"] += 1
+                if verbose_mode:
+                    print(f"{png_file.name} - needs analysis")
+                
+                batch.append(png_file)
+                if len(batch) == images_per_request:
+                    await queue.put(batch)
+                    batch = []
+        
+        if batch:
+            await queue.put(batch)
+        
+        # One sentinel per consumer
+        for _ in range(max_concurrent):
+            await queue.put(None)
+    
+    async def consume():
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            
+            try:
+                analyses = await analyze_screenshots_batch(batch)
+            except Exception as e:
+                print(f"Error analyzing {', '.join(f.name for f in batch)}: {e}")
+                continue
+            
+            for png_file, analysis in zip(batch, analyses):
+                success = await asyncio.to_thread(store_analysis_in_png, png_file, analysis)
+                counts["analyzed"] += 1
+                
+                print(f"\n[{counts['analyzed']}] Analyzed: {png_file.name}")
+                
+                if verbose_mode:
+                    display_analysis(analysis)
+                else:
+                    # Show brief results in non-verbose mode
+                    print(f"{analysis.title}")
+                    print(f"{analysis.short_description}")
+                    print(f"Type: {analysis.type}")
+                    print(f"Apps: {', '.join(analysis.apps) if analysis.apps else 'None detected'}")
+                
+                if success:
+                    print(f"Analysis saved to PNG metadata")
+                else:
+                    print(f"Failed to save analysis to PNG metadata")
+    
+    try:
+        await asyncio.gather(produce(), *[consume() for _ in range(max_concurrent)])
+    finally:
+        await client.close()
+    
+    return counts
+
+
+def find_files_to_analyze(png_files: List[Path]) -> List[Path]:
+    """Return the files that don't have analysis metadata yet"""
+    global verbose_mode
     
     files_to_analyze = []
     files_with_metadata = 0
     
-    # First pass: check which files need analysis
-    for png_file in png_files:
-        if has_analysis_metadata(png_file):
+    # Check which files need analysis, overlapping file reads
+    with ThreadPoolExecutor(max_workers=METADATA_SCAN_WORKERS) as executor:
+        has_metadata = list(executor.map(check_analysis_metadata, png_files))
+    
+    for png_file, analyzed in zip(png_files, has_metadata):
+        if analyzed:
             files_with_metadata += 1
             if verbose_mode:
                 print(f"{png_file.name} - already has analysis metadata")
@@ -288,42 +836,236 @@ def scan_and_analyze_directory(directory: Path):
     
     print(f"Summary: {files_with_metadata} files already analyzed, {len(files_to_analyze)} files need analysis")
     
-    if not files_to_analyze:
-        print("All PNG files already have analysis metadata!")
-        return
+    return files_to_analyze
+
+
+async def submit_analysis_batch(batch_input) -> str:
+    """Upload a JSONL file of analysis requests as a Batch API job and return its id"""
+    global openai_client
     
-    # Second pass: analyze files that need it
-    print(f"\nStarting analysis of {len(files_to_analyze)} files...")
+    batch_input.seek(0)
+    input_file = await openai_client.files.create(
+        file=("png-meta-batch.jsonl", batch_input),
+        purpose="batch"
+    )
+    
+    batch = await openai_client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+async def submit_analysis_batches(files_to_analyze: List[Path], state_path: Path) -> List[str]:
+    """Submit analysis requests for files as one or more Batch API jobs, returning their ids"""
+    batch_ids = []
     
-    for i, png_file in enumerate(files_to_analyze, 1):
-        print(f"\n[{i}/{len(files_to_analyze)}] Analyzing: {png_file.name}")
+    async def submit(batch_input, request_count: int):
+        batch_id = await submit_analysis_batch(batch_input)
+        batch_ids.append(batch_id)
         
-        try:
-            # Analyze the screenshot
-            analysis = analyze_screenshot(png_file)
+        # Persist the ids as they are created so an interrupted run can pick them back up
+        state_path.write_bytes(orjson.dumps({"batch_ids": batch_ids}))
+        print(f"Submitted batch {batch_id} ({request_count} files)")
+    
+    # Build the JSONL input on disk, as it holds every image
+    batch_input = tempfile.TemporaryFile()
+    request_count = 0
+    
+    try:
+        for png_file in files_to_analyze:
+            try:
+                image_content, _ = build_image_content(png_file)
+            except Exception as e:
+                print(f"Skipping {png_file.name}: {e}")
+                continue
             
-            if verbose_mode:
-                display_analysis(analysis)
-            else:
-                # Show brief results in non-verbose mode
-                print(f"{analysis.title}")
-                print(f"{analysis.short_description}")
-                print(f"Type: {analysis.type}")
-                print(f"Apps: {', '.join(analysis.apps) if analysis.apps else 'None detected'}")
+            request = {
+                "custom_id": str(png_file),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {**build_analysis_request(image_content), "response_format": ANALYSIS_RESPONSE_FORMAT}
+            }
+            line = orjson.dumps(request) + b'\n'
             
-            # Store analysis in PNG metadata
-            print(f"Storing analysis in PNG metadata...")
-            success = store_analysis_in_png(png_file, analysis)
-            if success:
-                print(f"Analysis saved to PNG metadata")
-            else:
-                print(f"Failed to save analysis to PNG metadata")
-                
+            if len(line) > BATCH_MAX_FILE_BYTES:
+                print(f"Skipping {png_file.name}: too large for the Batch API")
+                continue
+            
+            # Start a new batch when this request would push the file over a limit
+            if request_count and (request_count == BATCH_MAX_REQUESTS or
+                                  batch_input.tell() + len(line) > BATCH_MAX_FILE_BYTES):
+                await submit(batch_input, request_count)
+                batch_input.close()
+                batch_input = tempfile.TemporaryFile()
+                request_count = 0
+            
+            batch_input.write(line)
+            request_count += 1
+        
+        if request_count:
+            await submit(batch_input, request_count)
+    finally:
+        batch_input.close()
+    
+    return batch_ids
+
+
+async def store_batch_results(output_file_id: str) -> int:
+    """Store analyses from a Batch API output file, returning the number saved"""
+    global openai_client
+    
+    output = await openai_client.files.content(output_file_id)
+    saved = 0
+    
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        
+        result = orjson.loads(line)
+        png_file = Path(result["custom_id"])
+        response = result.get("response") or {}
+        
+        if response.get("status_code") != 200:
+            print(f"Error analyzing {png_file.name}: {result.get('error') or response.get('body')}")
+            continue
+        
+        if not png_file.exists():
+            print(f"Skipping {png_file.name}: file no longer exists")
+            continue
+        
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+            analysis_model = ScreenshotAnalysisModel.model_validate_json(content)
         except Exception as e:
-            print(f"Error analyzing {png_file.name}: {e}")
+            print(f"Error parsing analysis for {png_file.name}: {e}")
             continue
+        
+        analysis = ScreenshotAnalysis.from_pydantic_model(analysis_model, png_file)
+        print(f"\nAnalyzed: {png_file.name}")
+        print(f"{analysis.title}")
+        
+        if store_analysis_in_png(png_file, analysis):
+            saved += 1
+            print(f"Analysis saved to PNG metadata")
+        else:
+            print(f"Failed to save analysis to PNG metadata")
+    
+    return saved
+
+
+async def wait_for_batch(batch_id: str):
+    """Poll a batch until it reaches a final status and return it"""
+    global openai_client
     
-    print(f"\nScan complete! Analyzed {len(files_to_analyze)} PNG files.")
+    while True:
+        batch = await openai_client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        if counts:
+            print(f"Batch {batch_id} {batch.status}: {counts.completed}/{counts.total} completed, {counts.failed} failed")
+        else:
+            print(f"Batch {batch_id} {batch.status}")
+        
+        if batch.status in BATCH_FINAL_STATUSES:
+            return batch
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+
+
+async def analyze_files_with_batch_api(directory: Path, files_to_analyze: List[Path]):
+    """Analyze files through the Batch API, resuming previously submitted batches if there are any"""
+    global verbose_mode
+    
+    client = setup_openai_client()
+    state_path = directory / BATCH_STATE_FILENAME
+    
+    try:
+        if state_path.exists():
+            try:
+                batch_ids = orjson.loads(state_path.read_bytes())["batch_ids"]
+            except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+                print(f"Error: Could not read batch state from {state_path}: {e}")
+                print("Delete the file to start a new batch scan.")
+                return
+            
+            print(f"Resuming {len(batch_ids)} batch(es): {', '.join(batch_ids)}")
+        else:
+            print(f"Submitting {len(files_to_analyze)} files to the Batch API...")
+            batch_ids = await submit_analysis_batches(files_to_analyze, state_path)
+            if not batch_ids:
+                return
+            print("Results can take up to 24 hours. If interrupted, run the same command again to resume.")
+        
+        # Batches run independently, so wait on them all at once
+        batches = await asyncio.gather(*[wait_for_batch(batch_id) for batch_id in batch_ids])
+        
+        saved = 0
+        for batch in batches:
+            if batch.errors and batch.errors.data:
+                for error in batch.errors.data:
+                    print(f"Batch {batch.id} error: {error.message}")
+            
+            # Expired or cancelled batches can still have partial results
+            if batch.output_file_id:
+                saved += await store_batch_results(batch.output_file_id)
+            
+            if batch.error_file_id and verbose_mode:
+                errors = await client.files.content(batch.error_file_id)
+                print(errors.text)
+        
+        state_path.unlink()
+        print(f"\nBatch complete! Saved analysis for {saved} PNG files.")
+    finally:
+        await client.close()
+
+
+def run_batch_analysis(directory: Path, files_to_analyze: List[Path]):
+    """Run a Batch API scan, reporting API errors instead of raising them"""
+    try:
+        asyncio.run(analyze_files_with_batch_api(directory, files_to_analyze))
+    except APIError as e:
+        print(f"Error: Batch API request failed: {e}")
+        if (directory / BATCH_STATE_FILENAME).exists():
+            print("Run the same command again to resume the submitted batches.")
+
+
+def scan_and_analyze_directory(directory: Path, max_concurrent: int = 10, images_per_request: int = 4,
+                               use_batch_api: bool = False):
+    """Scan directory for PNG files and analyze those without metadata"""
+    global verbose_mode
+    
+    if use_batch_api and (directory / BATCH_STATE_FILENAME).exists():
+        run_batch_analysis(directory, [])
+        return
+    
+    png_files = list(iter_pngs(directory))
+    total_files = len(png_files)
+    
+    print(f"Scanning {total_files} PNG files in: {directory}")
+    
+    if use_batch_api:
+        # The Batch API needs every request up front
+        files_to_analyze = find_files_to_analyze(png_files)
+        if not files_to_analyze:
+            print("All PNG files already have analysis metadata!")
+            return
+        
+        run_batch_analysis(directory, files_to_analyze)
+        return
+    
+    # Analysis starts as soon as the first files without metadata are found
+    print(f"Analyzing files without metadata "
+          f"({max_concurrent} concurrent requests, up to {images_per_request} images each)...")
+    
+    counts = asyncio.run(analyze_directory_pipeline(png_files, max_concurrent, images_per_request))
+    
+    print(f"\nSummary: {counts['with_metadata']} files already analyzed, {counts['to_analyze']} files needed analysis")
+    
+    if not counts["to_analyze"]:
+        print("All PNG files already have analysis metadata!")
+        return
+    
+    print(f"\nScan complete! Analyzed {counts['analyzed']} PNG files.")
 
 
 def scan_existing_files(watch_dir: Path):
@@ -331,9 +1073,8 @@ def scan_existing_files(watch_dir: Path):
     global known_files, verbose_mode
     
     try:
-        for file_path in watch_dir.glob("*.png"):
-            if file_path.is_file():
-                known_files.add(file_path.name.lower())
+        for file_path in iter_pngs(watch_dir):
+            known_files.add(str(file_path.resolve()))
         if verbose_mode:
             print(f"Found {len(known_files)} existing PNG files")
     except Exception as e:
@@ -378,22 +1119,36 @@ def display_analysis(analysis: ScreenshotAnalysis):
         print(f"      {analysis.to_json()}")
 
 
-def handle_new_png(file_path: Path, event_type: str):
+async def wait_for_complete_file(file_path: Path) -> int:
+    """Wait until the file's size is non-zero and stable across two polls, returning the size"""
+    size = file_path.stat().st_size
+    for _ in range(FILE_STABLE_MAX_POLLS):
+        await asyncio.sleep(FILE_STABLE_POLL_SECONDS)
+        new_size = file_path.stat().st_size
+        if new_size == size and size > 0:
+            break
+        size = new_size
+    return size
+
+
+async def handle_new_png(file_path: Path, event_type: str):
     """Process a new PNG file"""
     global known_files, verbose_mode, analyze_mode
     
-    filename_lower = file_path.name.lower()
+    # Resolved paths avoid collisions between names differing only in case
+    resolved_path = str(file_path.resolve())
     
     # Check if it's actually a new file
-    if filename_lower not in known_files:
+    if resolved_path not in known_files:
         # Verify the file actually exists and is readable
         if file_path.exists() and file_path.is_file():
-            # Add a small delay to ensure file is fully written
-            time.sleep(0.1)
+            # Claim the file up front, so events raised while it is being
+            # analyzed (including our own metadata write) are ignored
+            known_files.add(resolved_path)
             
             try:
-                # Try to get file size to confirm it's accessible
-                file_size = file_path.stat().st_size
+                # Make sure the file has been fully written
+                file_size = await wait_for_complete_file(file_path)
                 
                 # Print the filename
                 print(f"New PNG: {file_path.name}")
@@ -406,27 +1161,37 @@ def handle_new_png(file_path: Path, event_type: str):
                 # Analyze with OpenAI if enabled
                 if analyze_mode:
                     print(f"Analyzing PNG with OpenAI...")
-                    analysis = analyze_screenshot(file_path)
-                    display_analysis(analysis)
+                    analysis = await analyze_screenshot(file_path)
                     
                     # Store analysis in PNG metadata
-                    print(f"Storing analysis in PNG metadata...")
-                    success = store_analysis_in_png(file_path, analysis)
+                    success = await asyncio.to_thread(store_analysis_in_png, file_path, analysis)
+                    
+                    print(f"\nAnalyzed: {file_path.name}")
+                    display_analysis(analysis)
                     if success:
                         print(f"Analysis saved to PNG metadata")
                     else:
                         print(f"Failed to save analysis to PNG metadata")
                 
-                # Add to known files
-                known_files.add(filename_lower)
-                
             except (OSError, PermissionError) as e:
+                known_files.discard(resolved_path)
                 if verbose_mode:
                     print(f"Could not access {file_path.name}: {e}")
 
 
 class SimpleFileHandler(FileSystemEventHandler):
-    """Simple file system event handler"""
+    """File system event handler that coalesces bursts of events and analyzes files concurrently"""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_concurrent: int):
+        super().__init__()
+        self.loop = loop
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        
+        # Path -> (time of last event, event type), shared with the debouncer thread
+        self._pending: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        
+        threading.Thread(target=self._debounce, daemon=True).start()
     
     def on_created(self, event):
         """Handle file creation events"""
@@ -438,13 +1203,44 @@ class SimpleFileHandler(FileSystemEventHandler):
         if not event.is_directory:
             self._handle_file_event(event.dest_path, "moved")
     
+    def on_closed(self, event):
+        """Handle file closed after writing events (inotify only)"""
+        if not event.is_directory:
+            self._handle_file_event(event.src_path, "closed")
+    
     def _handle_file_event(self, file_path_str: str, event_type: str):
         """Process file events and check if it's a new PNG"""
         file_path = Path(file_path_str)
         
         # Check if it's a PNG file
         if file_path.suffix.lower() == '.png':
-            handle_new_png(file_path, event_type)
+            with self._lock:
+                self._pending[file_path_str] = (time.monotonic(), event_type)
+    
+    def _debounce(self):
+        """Submit files once no new events have arrived for them within the debounce window"""
+        while True:
+            time.sleep(DEBOUNCE_POLL_SECONDS)
+            now = time.monotonic()
+            
+            with self._lock:
+                ready = [
+                    (path, event_type) for path, (event_time, event_type) in self._pending.items()
+                    if now - event_time >= DEBOUNCE_SECONDS
+                ]
+                for path, _ in ready:
+                    del self._pending[path]
+            
+            for path, event_type in ready:
+                asyncio.run_coroutine_threadsafe(self._process(Path(path), event_type), self.loop)
+    
+    async def _process(self, file_path: Path, event_type: str):
+        """Handle a new PNG, limiting how many are analyzed at once"""
+        async with self.semaphore:
+            try:
+                await handle_new_png(file_path, event_type)
+            except Exception as e:
+                print(f"Error processing {file_path.name}: {e}")
 
 
 def validate_directory(directory_path: Path) -> bool:
@@ -466,7 +1262,7 @@ def validate_directory(directory_path: Path) -> bool:
 
 def main():
     """Main function"""
-    global verbose_mode, analyze_mode
+    global verbose_mode, analyze_mode, openai_api_key, rate_limiter, png_compress_level, analysis_index
     
     parser = argparse.ArgumentParser(
         description="Watch a directory for new PNG files and print their filenames.",
@@ -513,6 +1309,55 @@ Setup:
         help='Watch specified directory and add analysis metadata for new PNG files'
     )
     
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Use the OpenAI Batch API when scanning (half price, results within 24 hours)'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=10,
+        help='Maximum number of concurrent OpenAI requests (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--images-per-request',
+        type=int,
+        default=4,
+        help=f'Number of images analyzed in each OpenAI request when scanning (1-{MAX_IMAGES_PER_REQUEST}, default: 4)'
+    )
+    
+    parser.add_argument(
+        '--max-rpm',
+        type=int,
+        default=500,
+        help='Maximum OpenAI requests per minute (default: 500)'
+    )
+    
+    parser.add_argument(
+        '--max-tpm',
+        type=int,
+        default=90000,
+        help='Maximum OpenAI tokens per minute (default: 90000)'
+    )
+    
+    parser.add_argument(
+        '--png-compress-level',
+        type=int,
+        choices=range(10),
+        default=1,
+        metavar='{0-9}',
+        help='zlib level used when a PNG has to be re-saved to add metadata (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--no-index',
+        action='store_true',
+        help=f'Don\'t use the index of analyzed files ({INDEX_PATH}) to skip unchanged files'
+    )
+    
     parser.add_argument(
         '--api-key',
         help='OpenAI API key (can also use OPENAI_API_KEY environment variable)'
@@ -530,10 +1375,27 @@ Setup:
     # Set global flags
     verbose_mode = args.verbose
     analyze_mode = True
+    png_compress_level = args.png_compress_level
     
     if not args.scan and not args.watch:
         print("Error: Either --scan or --watch is required")
         sys.exit(1)
+    
+    if args.batch and not args.scan:
+        print("Error: --batch can only be used with --scan")
+        sys.exit(1)
+    
+    if args.concurrency < 1:
+        print("Error: --concurrency must be at least 1")
+        sys.exit(1)
+    
+    if not 1 <= args.images_per_request <= MAX_IMAGES_PER_REQUEST:
+        print(f"Error: --images-per-request must be between 1 and {MAX_IMAGES_PER_REQUEST}")
+        sys.exit(1)
+    
+    if args.max_rpm < 1 or args.max_tpm < 1:
+        print("Error: --max-rpm and --max-tpm must be at least 1")
+        sys.exit(1)
 
     
     # Expand user path and resolve relative paths
@@ -543,6 +1405,13 @@ Setup:
     if not validate_directory(directory_path):
         sys.exit(1)
     
+    # Open the index of analyzed files
+    if not args.no_index:
+        try:
+            analysis_index = AnalysisIndex(INDEX_PATH)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: Could not open index {INDEX_PATH}: {e}")
+    
     # Check OpenAI setup if analysis is enabled
     if analyze_mode:
         api_key = args.api_key or os.getenv('OPENAI_API_KEY')
@@ -550,7 +1419,8 @@ Setup:
             print("Error: OpenAI API key required for analysis.")
             print("   Set OPENAI_API_KEY environment variable or use --api-key flag")
             sys.exit(1)
-        setup_openai_client(api_key)
+        openai_api_key = api_key
+        rate_limiter = RateLimiter(args.max_rpm, args.max_tpm)
     
     # Handle scan mode
     if args.scan:
@@ -560,7 +1430,7 @@ Setup:
             sys.exit(1)
         
         print("📂 Scan mode: Analyzing existing PNG files...")
-        scan_and_analyze_directory(directory_path)
+        scan_and_analyze_directory(directory_path, args.concurrency, args.images_per_request, args.batch)
 
     
     if not args.watch:
@@ -570,8 +1440,14 @@ Setup:
     # Scan existing files
     scan_existing_files(directory_path)
     
+    # Run analysis on a long lived event loop so new files are processed concurrently
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+    client = setup_openai_client()
+    
     # Create event handler
-    event_handler = SimpleFileHandler()
+    event_handler = SimpleFileHandler(loop, args.concurrency)
     
     # Set up observer
     observer = Observer()
@@ -602,6 +1478,11 @@ Setup:
     
     # Wait for observer to finish
     observer.join()
+    
+    # Close the client and stop the event loop
+    asyncio.run_coroutine_threadsafe(client.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    loop_thread.join()
     print("PNG watcher stopped")
 
 
@@ -609,4 +1490,4 @@ if __name__ == "__main__":
     main()
 
 # Installation requirements:
-# uv add watchdog openai python-dotenv pillow pydantic
\ No newline at end of file
+# uv add watchdog openai python-dotenv pillow pydantic orjson
\ No newline at end of file
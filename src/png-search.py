@@ -24,14 +24,19 @@
 import argparse
 import os
 import sys
-import json
+import re
+import hashlib
 import subprocess
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, defaultdict
+from typing import Iterator, List, Optional, Dict, Any
+import numpy as np
+import orjson
 from PIL import Image
 from openai import OpenAI
 from pydantic import BaseModel
-from config import META_TAG_NAME
+from config import META_TAG_NAME, iter_pngs
 
 # Load environment variables from .env file
 try:
@@ -42,6 +47,39 @@ except ImportError:
     pass
 
 
+# Number of threads used to read metadata from PNG files
+METADATA_READ_WORKERS = 16
+
+# Semantic search settings
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_BATCH_SIZE = 512
+EMBEDDING_MAX_CHARS = 8000
+EMBEDDING_BATCH_MAX_CHARS = 600000
+EMBEDDINGS_FILENAME = ".png-meta-embeddings.npy"
+EMBEDDINGS_INDEX_FILENAME = ".png-meta-embeddings.json"
+
+# Query words that don't help narrow keyword results
+STOP_WORDS = {
+    'a', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have',
+    'in', 'is', 'it', 'me', 'of', 'on', 'or', 'that', 'the', 'to', 'with'
+}
+
+# Tells the model how to match screenshot analyses against the query
+SYSTEM_PROMPT = """You are a screenshot search assistant. You will be given:
+1. A search query from the user
+2. Analysis data from multiple screenshots with index numbers
+
+Your task is to determine which screenshots match the search query based on their analysis data.
+
+You must return a list of indices (numbers) representing the screenshots that match the search criteria. 
+The indices correspond to the 'index' field in the analysis data.
+
+Be liberal in your matching - if there's any reasonable connection between the search query and the screenshot content, include it.
+If no screenshots match, return an empty list."""
+
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+
 class SearchResults(BaseModel):
     """Pydantic model for OpenAI structured search output"""
     matching_indices: List[int]
@@ -53,7 +91,8 @@ def read_analysis_from_png(image_path: Path) -> Optional[Dict[str, Any]]:
         with Image.open(image_path) as img:
             if hasattr(img, 'text') and img.text and META_TAG_NAME in img.text:
                 analysis_json = img.text[META_TAG_NAME]
-                return json.loads(analysis_json)
+                # iTXt values are a str subclass, which orjson doesn't accept
+                return orjson.loads(str(analysis_json))
         return None
     except Exception as e:
         if args.verbose:
@@ -65,14 +104,17 @@ def collect_png_analyses(directory: Path) -> List[Dict[str, Any]]:
     """Collect analysis metadata from all PNG files in directory"""
     analyses = []
     
-    png_files = list(directory.glob("*.png"))
+    png_files = list(iter_pngs(directory))
     total_files = len(png_files)
     
     if args.verbose:
         print(f"Scanning {total_files} PNG files...")
     
-    for png_file in png_files:
-        analysis = read_analysis_from_png(png_file)
+    # Read metadata from several files at once, as this is I/O bound
+    with ThreadPoolExecutor(max_workers=METADATA_READ_WORKERS) as executor:
+        results = list(executor.map(read_analysis_from_png, png_files))
+    
+    for png_file, analysis in zip(png_files, results):
         if analysis:
             # Add the file path to the analysis data
             analysis['_file_path'] = str(png_file)
@@ -89,6 +131,146 @@ def collect_png_analyses(directory: Path) -> List[Dict[str, Any]]:
     return analyses
 
 
+def format_result(analysis: Dict[str, Any]) -> str:
+    """Return the path or name of the file an analysis belongs to"""
+    return analysis['_file_path'] if args.paths else analysis['_file_name']
+
+
+def analysis_to_text(analysis: Dict[str, Any]) -> str:
+    """Flatten the searchable fields of an analysis into a single string"""
+    return "\n".join([
+        analysis.get('title', ''),
+        analysis.get('short_description', ''),
+        analysis.get('long_description', ''),
+        analysis.get('ai_description', ''),
+        analysis.get('type', ''),
+        ', '.join(analysis.get('apps', [])),
+        analysis.get('embedded_text', '')
+    ])
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word terms, including non-ASCII words"""
+    return re.findall(r"\w+", text.lower())
+
+
+def search_analyses_with_keywords(analyses: List[Dict[str, Any]], search_prompt: str) -> List[str]:
+    """Search analyses locally, ranking files by how many query terms they contain"""
+    # Inverted index from term to the analyses containing it
+    index = defaultdict(set)
+    for i, analysis in enumerate(analyses):
+        for term in set(tokenize(analysis_to_text(analysis))):
+            index[term].add(i)
+    
+    terms = [term for term in set(tokenize(search_prompt)) if term not in STOP_WORDS]
+    if args.verbose:
+        print(f"Searching for terms: {', '.join(sorted(terms)) or 'none'}")
+    
+    scores = Counter()
+    for term in terms:
+        for i in index.get(term, ()):
+            scores[i] += 1
+    
+    ranked = sorted(scores, key=lambda i: (-scores[i], i))
+    return [format_result(analyses[i]) for i in ranked]
+
+
+def chunk_texts(texts: List[str]) -> Iterator[List[str]]:
+    """Split texts into request sized chunks, limited by count and total length"""
+    chunk = []
+    chunk_chars = 0
+    for text in texts:
+        if chunk and (len(chunk) == EMBEDDING_BATCH_SIZE or chunk_chars + len(text) > EMBEDDING_BATCH_MAX_CHARS):
+            yield chunk
+            chunk = []
+            chunk_chars = 0
+        chunk.append(text)
+        chunk_chars += len(text)
+    
+    if chunk:
+        yield chunk
+
+
+def get_embeddings(texts: List[str], client: OpenAI) -> np.ndarray:
+    """Embed texts in as few requests as possible, returning a matrix of unit length rows"""
+    texts = [text[:EMBEDDING_MAX_CHARS] or " " for text in texts]
+    
+    vectors = []
+    for chunk in chunk_texts(texts):
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=chunk)
+        vectors.extend(item.embedding for item in response.data)
+    
+    matrix = np.array(vectors, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def load_analysis_embeddings(analyses: List[Dict[str, Any]], directory: Path, client: OpenAI) -> np.ndarray:
+    """Return embeddings for the analyses, only embedding those not already in the directory's cache"""
+    texts = [analysis_to_text(analysis) for analysis in analyses]
+    hashes = [hashlib.sha256(text.encode('utf-8')).hexdigest() for text in texts]
+    
+    matrix_path = directory / EMBEDDINGS_FILENAME
+    index_path = directory / EMBEDDINGS_INDEX_FILENAME
+    
+    # Cached rows keyed by the hash of the text they were created from
+    cached = {}
+    try:
+        cache_index = orjson.loads(index_path.read_bytes())
+        if cache_index['model'] == EMBEDDING_MODEL:
+            cached_matrix = np.load(matrix_path)
+            cached = {text_hash: cached_matrix[i] for i, text_hash in enumerate(cache_index['hashes'])}
+    except (OSError, ValueError, KeyError, IndexError):
+        pass
+    
+    missing = [i for i, text_hash in enumerate(hashes) if text_hash not in cached]
+    if not missing:
+        if args.verbose:
+            print(f"Using cached embeddings from {matrix_path.name}")
+        return np.array([cached[text_hash] for text_hash in hashes], dtype=np.float32)
+    
+    if args.verbose:
+        print(f"🤖 Creating embeddings for {len(missing)} of {len(texts)} analyses...")
+    
+    new_rows = get_embeddings([texts[i] for i in missing], client)
+    for i, row in zip(missing, new_rows):
+        cached[hashes[i]] = row
+    
+    matrix = np.array([cached[text_hash] for text_hash in hashes], dtype=np.float32)
+    
+    try:
+        np.save(matrix_path, matrix)
+        index_path.write_bytes(orjson.dumps({'model': EMBEDDING_MODEL, 'hashes': hashes}))
+    except OSError as e:
+        if args.verbose:
+            print(f"Could not cache embeddings: {e}")
+    
+    return matrix
+
+
+def search_analyses_with_embeddings(analyses: List[Dict[str, Any]], search_prompt: str, directory: Path,
+                                    client: OpenAI) -> List[str]:
+    """Search analyses by cosine similarity between the query and cached analysis embeddings"""
+    if not analyses:
+        return []
+    
+    try:
+        matrix = load_analysis_embeddings(analyses, directory, client)
+        query = get_embeddings([search_prompt], client)[0]
+    except Exception as e:
+        print(f"Error calling OpenAI API: {e}")
+        return []
+    
+    # Rows are unit length, so the dot product is the cosine similarity
+    similarities = matrix @ query
+    top_indices = np.argsort(-similarities)[:args.top_k]
+    
+    if args.verbose:
+        for i in top_indices:
+            print(f"{similarities[i]:.3f} {analyses[i]['_file_name']}")
+    
+    return [format_result(analyses[i]) for i in top_indices]
+
+
 def search_analyses_with_openai(analyses: List[Dict[str, Any]], search_prompt: str, client: OpenAI) -> List[str]:
     """Use OpenAI to search through analyses based on prompt with structured output"""
     if not analyses:
@@ -110,23 +292,10 @@ def search_analyses_with_openai(analyses: List[Dict[str, Any]], search_prompt: s
             'file_name': analysis['_file_name']
         }
     
-    # Create the system prompt for structured output
-    system_prompt = """You are a screenshot search assistant. You will be given:
-1. A search query from the user
-2. Analysis data from multiple screenshots with index numbers
-
-Your task is to determine which screenshots match the search query based on their analysis data.
-
-You must return a list of indices (numbers) representing the screenshots that match the search criteria. 
-The indices correspond to the 'index' field in the analysis data.
-
-Be liberal in your matching - if there's any reasonable connection between the search query and the screenshot content, include it.
-If no screenshots match, return an empty list."""
-
     user_prompt = f"""Search Query: "{search_prompt}"
 
 Screenshot Analysis Data:
-{json.dumps(analysis_data, indent=2)}
+{orjson.dumps(analysis_data, option=orjson.OPT_INDENT_2).decode('utf-8')}
 
 Return the indices of screenshots that match the search query."""
 
@@ -138,7 +307,7 @@ Return the indices of screenshots that match the search query."""
         response = client.beta.chat.completions.parse(
             model="gpt-4o-2024-08-06",
             messages=[
-                {"role": "system", "content": system_prompt},
+                SYSTEM_MESSAGE,
                 {"role": "user", "content": user_prompt}
             ],
             response_format=SearchResults,
@@ -194,6 +363,8 @@ Examples:
   %(prog)s --dir ~/Desktop/ --prompt "show me screenshots with Terminal"
   %(prog)s --dir ~/Screenshots/ --prompt "find images with code editors" --verbose
   %(prog)s --dir ~/Desktop/ --prompt "screenshots containing error messages"
+  %(prog)s --dir ~/Desktop/ --prompt "terminal" --mode keyword
+  %(prog)s --dir ~/Desktop/ --prompt "charts about sales" --mode semantic --top-k 5
   
 Environment Variables:
   OPENAI_API_KEY    Your OpenAI API key for analysis search
@@ -224,6 +395,20 @@ Environment Variables:
         help='Return full file paths instead of just filenames'
     )
     
+    parser.add_argument(
+        '--mode',
+        choices=['keyword', 'semantic', 'llm'],
+        default='llm',
+        help='Search locally by keyword, by embedding similarity, or by sending all analyses to the model (default: llm)'
+    )
+    
+    parser.add_argument(
+        '--top-k',
+        type=int,
+        default=10,
+        help='Number of results to return in semantic mode (default: 10)'
+    )
+    
     parser.add_argument(
         '--api-key',
         help='OpenAI API key (can also use OPENAI_API_KEY environment variable)'
@@ -251,15 +436,21 @@ Environment Variables:
     if not validate_directory(directory_path):
         sys.exit(1)
     
-    # Check OpenAI setup
-    api_key = args.api_key or os.getenv('OPENAI_API_KEY')
-    if not api_key:
-        print("Error: OpenAI API key required for analysis search.")
-        print("   Set OPENAI_API_KEY environment variable or use --api-key flag")
+    if args.top_k < 1:
+        print("Error: --top-k must be at least 1")
         sys.exit(1)
     
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
+    # Check OpenAI setup (keyword search runs locally)
+    client = None
+    if args.mode != 'keyword':
+        api_key = args.api_key or os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            print("Error: OpenAI API key required for analysis search.")
+            print("   Set OPENAI_API_KEY environment variable or use --api-key flag")
+            sys.exit(1)
+        
+        # Initialize OpenAI client
+        client = OpenAI(api_key=api_key)
     
     # Collect analysis data from PNG files
     if args.verbose:
@@ -272,12 +463,17 @@ Environment Variables:
         print("No PNG files with analysis metadata found in directory")
         sys.exit(1)
     
-    # Search using OpenAI
-    matching_files = search_analyses_with_openai(analyses, args.prompt, client)
+    # Search using the selected mode
+    if args.mode == 'keyword':
+        matching_files = search_analyses_with_keywords(analyses, args.prompt)
+    elif args.mode == 'semantic':
+        matching_files = search_analyses_with_embeddings(analyses, args.prompt, directory_path, client)
+    else:
+        matching_files = search_analyses_with_openai(analyses, args.prompt, client)
     
     # Output results
     if args.json:
-        print(json.dumps(matching_files, indent=2))
+        print(orjson.dumps(matching_files, option=orjson.OPT_INDENT_2).decode('utf-8'))
     else:
         if matching_files:
             if args.verbose:
@@ -295,4 +491,4 @@ if __name__ == "__main__":
     main()
 
 # Installation requirements:
-# uv add openai python-dotenv pillow pydantic
\ No newline at end of file
+# uv add openai python-dotenv pillow pydantic numpy orjson
\ No newline at end of file